@@ -1,75 +1,184 @@
 # D:\mini-rag-chatbot\api\query.py
 
 from http.server import BaseHTTPRequestHandler
-import json
+import asyncio
+import logging
 import os
 from typing import Dict, Any
 
+import httpx
+import orjson
+from groq import AsyncGroq
+
 # Import the RAGChatbot class from the file we will create next
 from src.rag_core import RAGChatbot
 
+# Configure logging once per cold start; per-request debug output is off by
+# default, and an unknown LOG_LEVEL falls back to WARNING
+LOG_LEVEL = os.getenv("LOG_LEVEL", "WARNING").upper()
+logging.basicConfig(level=LOG_LEVEL if isinstance(logging.getLevelName(LOG_LEVEL), int) else logging.WARNING)
+logger = logging.getLogger(__name__)
+
+# One event loop per warm instance: the pooled HTTP client below is bound to it
+LOOP = asyncio.new_event_loop()
+asyncio.set_event_loop(LOOP)
+
 # Initialize the chatbot globally for performance
 try:
     GROQ_API_KEY = os.environ.get("GROQ_API_KEY" )
     if not GROQ_API_KEY:
         # This will raise an error if the key is not set in Vercel
         raise ValueError("GROQ_API_KEY environment variable not set.")
+    
+    # Keep-alive HTTP/2 connections to Groq are reused across invocations
+    GROQ_CLIENT = AsyncGroq(
+        api_key=GROQ_API_KEY,
+        http_client=httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(max_connections=64, max_keepalive_connections=32),
+            timeout=30
+        )
+    )
         
     # NOTE: The model name 'llama-3.2-3b-preview' is taken from your code.
     RAG_BOT = RAGChatbot(
         vectorstore_dir="vectorstore",
-        groq_api_key=GROQ_API_KEY,
         model="llama-3.2-3b-preview",
         top_k=4,
-        temperature=0.1
+        temperature=0.1,
+        client=GROQ_CLIENT
     )
 except Exception as e:
-    print(f"Error initializing RAGChatbot: {e}")
+    logger.error("Error initializing RAGChatbot: %s", e)
     RAG_BOT = None
 
 
-def handler(request: BaseHTTPRequestHandler) -> Dict[str, Any]:
+async def warmup(bot: RAGChatbot):
     """
-    The entry point for the Vercel Serverless Function.
+    Pay one-time costs (index page-in, embedder first call, Groq TLS
+    handshake) during cold start instead of on the first user request.
     """
-    headers = {
-        'Content-Type': 'application/json',
-        'Access-Control-Allow-Origin': '*',
-        'Access-Control-Allow-Methods': 'POST, OPTIONS',
-        'Access-Control-Allow-Headers': 'Content-Type'
-    }
-
-    if request.method == 'OPTIONS':
-        return {'statusCode': 200, 'headers': headers, 'body': ''}
+    await asyncio.to_thread(bot.retriever.search, "warmup", 1)
+    await bot.client.chat.completions.create(
+        model=bot.model,
+        messages=[{"role": "user", "content": "ok"}],
+        max_tokens=1
+    )
 
-    if request.method != 'POST':
-        return {'statusCode': 405, 'headers': headers, 'body': json.dumps({'error': 'Method Not Allowed'})}
 
-    # Parse the request body
+if RAG_BOT and os.getenv("WARMUP", "1") == "1":
     try:
-        body = json.loads(request.body)
-        user_query = body.get('question')
-        if not user_query:
-            raise ValueError("Missing 'question' in request body.")
+        LOOP.run_until_complete(warmup(RAG_BOT))
     except Exception as e:
-        return {'statusCode': 400, 'headers': headers, 'body': json.dumps({'error': f'Invalid request body: {str(e)}'})}
+        logger.warning("Warm-up failed: %s", e)
 
-    # Run the RAG pipeline
-    try:
-        if not RAG_BOT:
-            raise Exception("RAG Chatbot not initialized.")
-            
-        response_data = RAG_BOT.answer(user_query, return_sources=True)
-        
-        return {
-            'statusCode': 200,
-            'headers': headers,
-            'body': json.dumps(response_data)
-        }
-    except Exception as e:
-        print(f"Unhandled RAG error: {e}")
-        return {
-            'statusCode': 500,
-            'headers': headers,
-            'body': json.dumps({'error': f'Internal Server Error: {str(e)}'})
-        }
+
+# Requests only carry a question; anything larger is rejected before parsing
+MAX_BODY_BYTES = 8192
+
+HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Methods': 'POST, OPTIONS',
+    'Access-Control-Allow-Headers': 'Content-Type'
+}
+
+
+class handler(BaseHTTPRequestHandler):
+    """
+    The entry point for the Vercel Serverless Function.
+
+    POST {"question": "..."} returns the answer as JSON. With "stream": true
+    the answer is sent as chunked NDJSON: one {"delta": ...} line per token
+    batch, then a final {"sources": ..., "metadata": ...} line.
+    """
+    # Chunked transfer encoding needs HTTP/1.1
+    protocol_version = 'HTTP/1.1'
+
+    def _send_headers(self, status: int, content_type: str, extra: Dict[str, str] = None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        for key, value in {**HEADERS, **(extra or {})}.items():
+            self.send_header(key, value)
+        self.end_headers()
+
+    def _send_json(self, status: int, payload: Dict[str, Any]):
+        body = orjson.dumps(payload)
+        self._send_headers(status, 'application/json', {'Content-Length': str(len(body))})
+        self.wfile.write(body)
+
+    def _write_chunk(self, payload: Dict[str, Any]):
+        data = orjson.dumps(payload) + b'\n'
+        self.wfile.write(f"{len(data):X}\r\n".encode('ascii') + data + b"\r\n")
+        self.wfile.flush()
+
+    def log_message(self, format, *args):
+        # Route the per-request access log through logging instead of stderr
+        logger.debug(format, *args)
+
+    def do_OPTIONS(self):
+        self._send_headers(200, 'application/json', {'Content-Length': '0'})
+
+    def do_GET(self):
+        self._send_json(405, {'error': 'Method Not Allowed'})
+
+    def do_POST(self):
+        LOOP.run_until_complete(self.handle_post())
+
+    async def handle_post(self):
+        """
+        Async request handling shared by all invocations on this instance.
+        """
+        # Parse the request body
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+        except ValueError:
+            length = -1
+        # The body is left unread on these paths, so the connection cannot be
+        # reused (the leftover bytes would be parsed as the next request)
+        if length > MAX_BODY_BYTES:
+            self.close_connection = True
+            self._send_json(413, {'error': f'Request body too large (max {MAX_BODY_BYTES} bytes)'})
+            return
+        if length < 0:
+            self.close_connection = True
+            self._send_json(400, {'error': 'Invalid request body: Invalid Content-Length header.'})
+            return
+
+        try:
+            body = orjson.loads(self.rfile.read(length))
+            if not isinstance(body, dict):
+                raise ValueError("Request body must be a JSON object.")
+            user_query = body.get('question')
+            if not user_query:
+                raise ValueError("Missing 'question' in request body.")
+            stream = bool(body.get('stream', False))
+        except Exception as e:
+            self._send_json(400, {'error': f'Invalid request body: {str(e)}'})
+            return
+
+        # Run the RAG pipeline
+        try:
+            if not RAG_BOT:
+                raise Exception("RAG Chatbot not initialized.")
+
+            if not stream:
+                response_data = await RAG_BOT.answer(user_query, return_sources=True)
+                self._send_json(200, response_data)
+                return
+
+            result = await RAG_BOT.answer_stream(user_query, return_sources=True)
+        except Exception as e:
+            logger.exception("Unhandled RAG error: %s", e)
+            self._send_json(500, {'error': f'Internal Server Error: {str(e)}'})
+            return
+
+        # Stream the answer as it is generated
+        self._send_headers(200, 'application/x-ndjson', {'Transfer-Encoding': 'chunked'})
+        try:
+            async for delta in result['answer']:
+                self._write_chunk({'delta': delta})
+            self._write_chunk({'sources': result['sources'], 'metadata': result['metadata']})
+        except Exception as e:
+            logger.exception("Unhandled RAG error while streaming: %s", e)
+            self._write_chunk({'error': f'Internal Server Error: {str(e)}'})
+        self.wfile.write(b"0\r\n\r\n")
@@ -3,10 +3,14 @@ Download sample research papers for testing
 Fetches open-access papers from ArXiv
 """
 
-import urllib.request
-import os
+import sys
 from pathlib import Path
 
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent / "src"))
+
+from download_utils import download_papers
+
 
 # Sample papers (famous ML/AI papers on ArXiv)
 SAMPLE_PAPERS = {
@@ -18,25 +22,6 @@ SAMPLE_PAPERS = {
 }
 
 
-def download_paper(url: str, filename: str, data_dir: Path):
-    """Download a single paper"""
-    filepath = data_dir / filename
-    
-    if filepath.exists():
-        print(f"⚠ {filename} already exists, skipping...")
-        return False
-    
-    try:
-        print(f"Downloading {filename}...")
-        urllib.request.urlretrieve(url, filepath)
-        size_mb = filepath.stat().st_size / (1024 * 1024)
-        print(f"✓ Downloaded {filename} ({size_mb:.1f} MB)")
-        return True
-    except Exception as e:
-        print(f"✗ Failed to download {filename}: {str(e)}")
-        return False
-
-
 def main():
     """Download all sample papers"""
     print("=" * 60)
@@ -49,12 +34,9 @@ def main():
     data_dir.mkdir(exist_ok=True)
     print(f"✓ Data directory: {data_dir.absolute()}\n")
     
-    # Download papers
-    downloaded = 0
-    for filename, url in SAMPLE_PAPERS.items():
-        if download_paper(url, filename, data_dir):
-            downloaded += 1
-        print()
+    # Download papers in parallel
+    downloaded = download_papers(SAMPLE_PAPERS, data_dir)
+    print()
     
     # Summary
     print("=" * 60)
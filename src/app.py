@@ -10,6 +10,8 @@ import os
 # Add parent directory to path
 sys.path.append(str(Path(__file__).parent))
 
+from groq import Groq
+
 from chatbot_groq import RAGChatbot
 from retrieval import Retriever
 
@@ -21,34 +23,73 @@ st.set_page_config(
     layout="wide"
 )
 
-# Custom CSS
-st.markdown("""
+# Custom CSS (Streamlit drops elements that are not re-emitted, so this is
+# sent on every rerun; it is a single small element)
+CUSTOM_CSS = """
 <style>
     .stChatMessage {
         padding: 1rem;
         border-radius: 0.5rem;
     }
-    .source-box {
-        background-color: #f0f2f6;
-        padding: 1rem;
-        border-radius: 0.5rem;
-        margin: 0.5rem 0;
-    }
 </style>
-""", unsafe_allow_html=True)
+"""
+st.markdown(CUSTOM_CSS, unsafe_allow_html=True)
+
+
+def _index_mtime(vectorstore_dir: str) -> float:
+    """Modification time of metadata.json (swapped in last by ingest.py), used to invalidate cached loads"""
+    metadata_path = Path(vectorstore_dir) / "metadata.json"
+    return metadata_path.stat().st_mtime if metadata_path.exists() else 0.0
+
+
+@st.cache_resource
+def _get_retriever(vectorstore_dir: str, mtime: float):
+    """Load retriever (cached until the index changes on disk)"""
+    return Retriever(vectorstore_dir=vectorstore_dir)
 
 
 @st.cache_resource
-def load_chatbot(vectorstore_dir: str, model: str, top_k: int, api_key: str):
-    """Load chatbot (cached)"""
+def _get_groq_client(api_key: str):
+    """Create Groq client (cached per API key so connections are reused)"""
+    return Groq(api_key=api_key)
+
+
+# One wrapper per settings combination; bounded since every slider move adds one
+@st.cache_resource(max_entries=32)
+def load_chatbot(
+    vectorstore_dir: str,
+    mtime: float,
+    model: str,
+    top_k: int,
+    api_key: str,
+    temperature: float,
+    max_context_chars: int
+):
+    """
+    Load chatbot (cached). The index and the Groq client are cached separately,
+    so new settings only build a light wrapper with its own answer cache (every
+    setting that changes the answer is part of the key, so cached answers never
+    outlive the settings they were generated with).
+    """
     return RAGChatbot(
-        vectorstore_dir=vectorstore_dir,
-        groq_api_key=api_key,
+        retriever=_get_retriever(vectorstore_dir, mtime),
+        client=_get_groq_client(api_key),
         model=model,
-        top_k=top_k
+        top_k=top_k,
+        temperature=temperature,
+        max_context_chars=max_context_chars
     )
 
 
+def render_sources(sources):
+    """Show retrieved sources with native components"""
+    with st.expander("📚 View Sources"):
+        for i, source in enumerate(sources, 1):
+            with st.container(border=True):
+                st.caption(f"**Source {i}** (Relevance: {source['score']:.4f}) · {source['source']}")
+                st.text(source['content'][:300] + "...")
+
+
 def main():
     # Header
     st.title("🤖 Mini RAG Chatbot")
@@ -106,13 +147,21 @@ def main():
             help="Lower = more focused, Higher = more creative"
         )
         
+        max_context_chars = st.slider(
+            "Max Context Characters",
+            min_value=1000,
+            max_value=20000,
+            value=6000,
+            step=500,
+            help="Retrieved chunks are deduplicated and trimmed to fit this budget. Lower = fewer prompt tokens, faster and cheaper answers"
+        )
+        
         st.markdown("---")
         
         # Show stats
         if Path(vectorstore_dir).exists():
             try:
-                retriever = Retriever(vectorstore_dir=vectorstore_dir)
-                stats = retriever.get_stats()
+                stats = _get_retriever(vectorstore_dir, _index_mtime(vectorstore_dir)).get_stats()
                 
                 st.subheader("📊 Dataset Stats")
                 st.metric("Total Chunks", stats['total_chunks'])
@@ -137,8 +186,10 @@ def main():
     # Initialize chatbot
     try:
         with st.spinner("Loading chatbot..."):
-            chatbot = load_chatbot(vectorstore_dir, model, top_k, api_key)
-            chatbot.temperature = temperature
+            chatbot = load_chatbot(
+                vectorstore_dir, _index_mtime(vectorstore_dir), model, top_k, api_key,
+                temperature, max_context_chars
+            )
     except Exception as e:
         st.error(f"❌ Error loading chatbot: {str(e)}")
         st.info("Make sure your Groq API key is valid.")
@@ -155,15 +206,7 @@ def main():
             
             # Show sources if available
             if message["role"] == "assistant" and "sources" in message:
-                with st.expander("📚 View Sources"):
-                    for i, source in enumerate(message["sources"], 1):
-                        st.markdown(f"""
-                        <div class="source-box">
-                            <strong>Source {i}</strong> (Relevance: {source['score']:.4f})<br>
-                            <small>{source['source']}</small><br><br>
-                            {source['content'][:300]}...
-                        </div>
-                        """, unsafe_allow_html=True)
+                render_sources(message["sources"])
     
     # Chat input
     if prompt := st.chat_input("Ask a question about your documents..."):
@@ -175,38 +218,30 @@ def main():
         
         # Generate response
         with st.chat_message("assistant"):
-            with st.spinner("Thinking..."):
-                try:
-                    result = chatbot.answer(prompt)
-                    
-                    # Display answer
-                    st.markdown(result['answer'])
-                    
-                    # Store message with sources
-                    st.session_state.messages.append({
-                        "role": "assistant",
-                        "content": result['answer'],
-                        "sources": result['sources']
-                    })
-                    
-                    # Show sources
-                    with st.expander("📚 View Sources"):
-                        for i, source in enumerate(result['sources'], 1):
-                            st.markdown(f"""
-                            <div class="source-box">
-                                <strong>Source {i}</strong> (Relevance: {source['score']:.4f})<br>
-                                <small>{source['source']}</small><br><br>
-                                {source['content'][:300]}...
-                            </div>
-                            """, unsafe_allow_html=True)
+            try:
+                with st.spinner("Thinking..."):
+                    result = chatbot.answer_stream(prompt)
+                
+                # Display answer as it is generated
+                answer = st.write_stream(result['answer'])
+                
+                # Store message with sources
+                st.session_state.messages.append({
+                    "role": "assistant",
+                    "content": answer,
+                    "sources": result['sources']
+                })
                     
-                except Exception as e:
-                    error_msg = f"❌ Error: {str(e)}"
-                    st.error(error_msg)
-                    st.session_state.messages.append({
-                        "role": "assistant",
-                        "content": error_msg
-                    })
+                # Show sources
+                render_sources(result['sources'])
+                
+            except Exception as e:
+                error_msg = f"❌ Error: {str(e)}"
+                st.error(error_msg)
+                st.session_state.messages.append({
+                    "role": "assistant",
+                    "content": error_msg
+                })
     
     # Clear chat button
     if st.session_state.messages:
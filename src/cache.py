@@ -0,0 +1,178 @@
+"""
+Semantic Query Cache
+Returns stored answers for questions whose embeddings are near-duplicates
+"""
+
+import logging
+import threading
+import time
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class SemanticCache:
+    def __init__(
+        self,
+        threshold: float = 0.95,
+        max_entries: int = 256,
+        ttl: float = 3600.0
+    ):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+
+        # Preallocated slab: row i holds the L2-normalised embedding of entry i,
+        # only the first _cache_vecs_count rows are live
+        self._cache_mat: Optional[np.ndarray] = None
+        self._cache_entries: list = []
+        self._cache_vecs_count = 0
+
+        # The cache is shared by every session / request thread of a chatbot
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        """Return a float32 unit vector"""
+        q = np.ascontiguousarray(embedding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(q)
+        if norm > 0:
+            q = q / norm
+        return q
+
+    def _expired(self, entry: Dict[str, Any]) -> bool:
+        return self.ttl is not None and time.monotonic() - entry['created'] > self.ttl
+
+    def _compact(self, keep: List[int]):
+        """Keep only the given rows, copying survivors to the front of the slab"""
+        n = len(keep)
+        if n < self._cache_vecs_count:
+            self._cache_mat[:n] = self._cache_mat[keep]
+            self._cache_entries = [self._cache_entries[i] for i in keep]
+            self._cache_vecs_count = n
+
+    def _evict(self, index: int):
+        """Remove entry at the given row"""
+        self._compact([i for i in range(self._cache_vecs_count) if i != index])
+
+    def lookup(self, embedding) -> Optional[Dict[str, Any]]:
+        """
+        Find a cached response for a query embedding
+
+        Args:
+            embedding: Query embedding
+
+        Returns:
+            Cached response dict, or None on a miss
+        """
+        q = self._normalize(embedding)
+
+        with self._lock:
+            n = self._cache_vecs_count
+            if n == 0:
+                self.misses += 1
+                return None
+
+            # One sgemv over the live rows (float32, C-contiguous)
+            scores = self._cache_mat[:n] @ q
+            best = int(scores.argmax())
+
+            if scores[best] < self.threshold:
+                self.misses += 1
+                return None
+
+            entry = self._cache_entries[best]
+            if self._expired(entry):
+                self._evict(best)
+                self.misses += 1
+                return None
+
+            entry['last_used'] = time.monotonic()
+            self.hits += 1
+            return entry['response']
+
+    def lookup_response(self, embedding, query: str, return_sources: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        Build a chatbot response for a query from the cache
+
+        Args:
+            embedding: Query embedding
+            query: User question (recorded in the metadata)
+            return_sources: Whether to include the cached sources
+
+        Returns:
+            Response dict (metadata.cache_hit=True), or None on a miss
+        """
+        cached = self.lookup(embedding)
+        if cached is None:
+            return None
+
+        logger.debug("Answer served from cache")
+        return {
+            'answer': cached['answer'],
+            'sources': cached['sources'] if return_sources else [],
+            'metadata': {**cached['metadata'], 'query': query, 'cache_hit': True}
+        }
+
+    def add(self, embedding, response: Dict[str, Any]):
+        """
+        Store a response for a query embedding
+
+        Args:
+            embedding: Query embedding
+            response: Response dict returned by the chatbot
+        """
+        if self.max_entries <= 0:
+            return
+
+        q = self._normalize(embedding)
+
+        with self._lock:
+            if self._cache_mat is None:
+                self._cache_mat = np.zeros((self.max_entries, q.shape[0]), dtype=np.float32)
+
+            # Drop expired entries first, then the least recently used one
+            if self.ttl is not None:
+                self._compact([
+                    i for i in range(self._cache_vecs_count)
+                    if not self._expired(self._cache_entries[i])
+                ])
+
+            if self._cache_vecs_count >= self.max_entries:
+                lru = min(
+                    range(self._cache_vecs_count),
+                    key=lambda i: self._cache_entries[i]['last_used']
+                )
+                self._evict(lru)
+
+            self._cache_mat[self._cache_vecs_count] = q
+
+            now = time.monotonic()
+            self._cache_entries.append({
+                'response': response,
+                'created': now,
+                'last_used': now
+            })
+            self._cache_vecs_count += 1
+
+    def clear(self):
+        """Remove all cached entries"""
+        with self._lock:
+            self._cache_mat = None
+            self._cache_entries = []
+            self._cache_vecs_count = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics"""
+        total = self.hits + self.misses
+        return {
+            'entries': self._cache_vecs_count,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0
+        }
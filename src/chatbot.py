@@ -3,9 +3,14 @@ RAG Chatbot - Main logic for question answering
 Uses Llama 3.2 via Ollama for generation
 """
 
+import logging
 from typing import List, Dict, Any
 import ollama
 from retrieval import Retriever
+from cache import SemanticCache
+from prompts import SYSTEM_MSG, build_context, create_user_message
+
+logger = logging.getLogger(__name__)
 
 
 class RAGChatbot:
@@ -14,20 +19,30 @@ class RAGChatbot:
         vectorstore_dir: str = "vectorstore",
         model: str = "llama3.2",
         top_k: int = 4,
-        temperature: float = 0.1
+        temperature: float = 0.1,
+        max_context_chars: int = 6000,
+        use_cache: bool = True,
+        cache_threshold: float = 0.95,
+        retriever: Retriever = None
     ):
         self.model = model
         self.temperature = temperature
         self.top_k = top_k
+        self.max_context_chars = max_context_chars
+        
+        # Initialize retriever (reuse an already loaded one when given)
+        if retriever is None:
+            logger.info("Initializing retriever...")
+            retriever = Retriever(vectorstore_dir=vectorstore_dir, top_k=top_k)
+        self.retriever = retriever
         
-        # Initialize retriever
-        print("Initializing retriever...")
-        self.retriever = Retriever(vectorstore_dir=vectorstore_dir, top_k=top_k)
+        # Semantic cache for repeated / near-duplicate questions
+        self.cache = SemanticCache(threshold=cache_threshold) if use_cache else None
         
         # Check if Ollama model is available
         self._check_model()
         
-        print(f"✓ RAG Chatbot ready with {self.model}")
+        logger.info("RAG Chatbot ready with %s", self.model)
     
     def _check_model(self):
         """Check if Ollama model is available"""
@@ -37,32 +52,19 @@ class RAGChatbot:
             model_names = [m['name'] for m in models.get('models', [])]
             
             if not any(self.model in name for name in model_names):
-                print(f"\n⚠ Warning: {self.model} not found in Ollama.")
-                print(f"Available models: {model_names}")
-                print(f"\nTo install, run: ollama pull {self.model}")
+                logger.warning(
+                    "%s not found in Ollama. Available models: %s. To install, run: ollama pull %s",
+                    self.model, model_names, self.model
+                )
                 
         except Exception as e:
-            print(f"\n⚠ Warning: Could not connect to Ollama: {str(e)}")
-            print("Make sure Ollama is running. Install from: https://ollama.ai")
+            logger.warning(
+                "Could not connect to Ollama: %s. Make sure Ollama is running. Install from: https://ollama.ai", e
+            )
     
     def _create_prompt(self, query: str, context: str) -> str:
-        """Create RAG prompt with context"""
-        prompt = f"""You are a helpful research assistant. Answer the question based on the provided context from research papers.
-
-Context from research papers:
-{context}
-
-Question: {query}
-
-Instructions:
-- Answer based ONLY on the information in the context above
-- If the context doesn't contain enough information to answer, say so
-- Be concise but comprehensive
-- Cite specific details from the context when relevant
-
-Answer:"""
-        
-        return prompt
+        """Create RAG prompt with context (instructions go in the system message)"""
+        return create_user_message(query, context)
     
     def answer(self, query: str, return_sources: bool = True) -> Dict[str, Any]:
         """
@@ -75,11 +77,19 @@ Answer:"""
         Returns:
             Dict with 'answer', 'sources', and 'metadata'
         """
-        print(f"\nProcessing query: {query}")
+        logger.debug("Processing query: %s", query)
+        
+        # Step 0: Check the semantic cache
+        query_embedding = None
+        if self.cache is not None:
+            query_embedding = self.retriever.embed_query(query)
+            cached = self.cache.lookup_response(query_embedding, query, return_sources)
+            if cached is not None:
+                return cached
         
         # Step 1: Retrieve relevant documents
-        print("Retrieving relevant documents...")
-        results = self.retriever.search(query, k=self.top_k)
+        logger.debug("Retrieving relevant documents...")
+        results = self.retriever.search(query, k=self.top_k, embedding=query_embedding)
         
         if not results:
             return {
@@ -89,19 +99,17 @@ Answer:"""
             }
         
         # Step 2: Create context
-        context = "\n\n".join([
-            f"[Source {i+1}]: {r['content']}" 
-            for i, r in enumerate(results)
-        ])
+        context, results = build_context(results, self.max_context_chars)
         
         # Step 3: Generate answer with Llama
-        print(f"Generating answer with {self.model}...")
+        logger.debug("Generating answer with %s...", self.model)
         prompt = self._create_prompt(query, context)
         
         try:
             response = ollama.generate(
                 model=self.model,
                 prompt=prompt,
+                system=SYSTEM_MSG,
                 options={
                     'temperature': self.temperature,
                     'num_predict': 512
@@ -109,10 +117,12 @@ Answer:"""
             )
             
             answer = response['response'].strip()
+            generated = True
             
         except Exception as e:
             answer = f"Error generating answer: {str(e)}"
-            print(f"✗ Generation error: {str(e)}")
+            generated = False
+            logger.error("Generation error: %s", e)
         
         # Step 4: Format response
         response_data = {
@@ -125,6 +135,9 @@ Answer:"""
             }
         }
         
+        if self.cache is not None and generated:
+            self.cache.add(query_embedding, {**response_data, 'sources': results})
+        
         return response_data
     
     def chat(self):
@@ -177,6 +190,7 @@ def main():
     parser.add_argument("--query", help="Single query (non-interactive mode)")
     
     args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     
     try:
         chatbot = RAGChatbot(
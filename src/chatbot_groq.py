@@ -2,9 +2,14 @@
 RAG Chatbot using Groq API (Free Llama 3.2)
 """
 
+import logging
 from typing import List, Dict, Any
 from groq import Groq
 from retrieval import Retriever
+from cache import SemanticCache
+from prompts import build_context, create_messages
+
+logger = logging.getLogger(__name__)
 
 
 class RAGChatbot:
@@ -14,42 +19,41 @@ class RAGChatbot:
         groq_api_key: str = None,
         model: str = "llama-3.2-3b-preview",
         top_k: int = 4,
-        temperature: float = 0.1
+        temperature: float = 0.1,
+        max_context_chars: int = 6000,
+        retriever: Retriever = None,
+        client: Groq = None,
+        use_cache: bool = True,
+        cache_threshold: float = 0.95
     ):
         self.model = model
         self.temperature = temperature
         self.top_k = top_k
+        self.max_context_chars = max_context_chars
         
-        # Initialize Groq client
-        if not groq_api_key:
-            raise ValueError("Please provide a Groq API key")
+        # Initialize Groq client (reuse a shared one when given)
+        if client is None:
+            if not groq_api_key:
+                raise ValueError("Please provide a Groq API key")
+            
+            client = Groq(api_key=groq_api_key)
         
-        self.client = Groq(api_key=groq_api_key)
+        self.client = client
         
-        # Initialize retriever
-        print("Initializing retriever...")
-        self.retriever = Retriever(vectorstore_dir=vectorstore_dir, top_k=top_k)
+        # Initialize retriever (reuse an already loaded one when given)
+        if retriever is None:
+            logger.info("Initializing retriever...")
+            retriever = Retriever(vectorstore_dir=vectorstore_dir, top_k=top_k)
+        self.retriever = retriever
         
-        print(f"✓ RAG Chatbot ready with {self.model}")
-    
-    def _create_prompt(self, query: str, context: str) -> str:
-        """Create RAG prompt with context"""
-        prompt = f"""You are a helpful research assistant. Answer the question based on the provided context from research papers.
-
-Context from research papers:
-{context}
-
-Question: {query}
-
-Instructions:
-- Answer based ONLY on the information in the context above
-- If the context doesn't contain enough information to answer, say so
-- Be concise but comprehensive
-- Cite specific details from the context when relevant
-
-Answer:"""
+        # Semantic cache for repeated / near-duplicate questions
+        self.cache = SemanticCache(threshold=cache_threshold) if use_cache else None
         
-        return prompt
+        logger.info("RAG Chatbot ready with %s", self.model)
+    
+    def _create_messages(self, query: str, context: str) -> List[Dict[str, str]]:
+        """Create RAG chat messages with context"""
+        return create_messages(query, context)
     
     def answer(self, query: str, return_sources: bool = True) -> Dict[str, Any]:
         """
@@ -62,11 +66,19 @@ Answer:"""
         Returns:
             Dict with 'answer', 'sources', and 'metadata'
         """
-        print(f"\nProcessing query: {query}")
+        logger.debug("Processing query: %s", query)
+        
+        # Step 0: Check the semantic cache
+        query_embedding = None
+        if self.cache is not None:
+            query_embedding = self.retriever.embed_query(query)
+            cached = self.cache.lookup_response(query_embedding, query, return_sources)
+            if cached is not None:
+                return cached
         
         # Step 1: Retrieve relevant documents
-        print("Retrieving relevant documents...")
-        results = self.retriever.search(query, k=self.top_k)
+        logger.debug("Retrieving relevant documents...")
+        results = self.retriever.search(query, k=self.top_k, embedding=query_embedding)
         
         if not results:
             return {
@@ -76,30 +88,27 @@ Answer:"""
             }
         
         # Step 2: Create context
-        context = "\n\n".join([
-            f"[Source {i+1}]: {r['content']}" 
-            for i, r in enumerate(results)
-        ])
+        context, results = build_context(results, self.max_context_chars)
         
         # Step 3: Generate answer with Groq
-        print(f"Generating answer with {self.model}...")
-        prompt = self._create_prompt(query, context)
+        logger.debug("Generating answer with %s...", self.model)
+        messages = self._create_messages(query, context)
         
         try:
             response = self.client.chat.completions.create(
                 model=self.model,
-                messages=[
-                    {"role": "user", "content": prompt}
-                ],
+                messages=messages,
                 temperature=self.temperature,
                 max_tokens=512
             )
             
             answer = response.choices[0].message.content.strip()
+            generated = True
             
         except Exception as e:
             answer = f"Error generating answer: {str(e)}"
-            print(f"✗ Generation error: {str(e)}")
+            generated = False
+            logger.error("Generation error: %s", e)
         
         # Step 4: Format response
         response_data = {
@@ -112,8 +121,98 @@ Answer:"""
             }
         }
         
+        if self.cache is not None and generated:
+            self.cache.add(query_embedding, {**response_data, 'sources': results})
+        
         return response_data
     
+    def answer_stream(self, query: str, return_sources: bool = True) -> Dict[str, Any]:
+        """
+        Answer a question using RAG, streaming the generated text
+        
+        Args:
+            query: User question
+            return_sources: Whether to return source documents
+            
+        Returns:
+            Dict like answer(), except 'answer' is an iterator of text chunks
+        """
+        logger.debug("Processing query (streaming): %s", query)
+        
+        # Step 0: Check the semantic cache
+        query_embedding = None
+        if self.cache is not None:
+            query_embedding = self.retriever.embed_query(query)
+            cached = self.cache.lookup_response(query_embedding, query, return_sources)
+            if cached is not None:
+                cached['answer'] = self._single_chunk(cached['answer'])
+                return cached
+        
+        # Step 1: Retrieve relevant documents
+        logger.debug("Retrieving relevant documents...")
+        results = self.retriever.search(query, k=self.top_k, embedding=query_embedding)
+        
+        if not results:
+            return {
+                'answer': self._single_chunk("I couldn't find any relevant information in the documents."),
+                'sources': [],
+                'metadata': {'retrieved_chunks': 0}
+            }
+        
+        # Step 2: Create context
+        context, results = build_context(results, self.max_context_chars)
+        
+        # Step 3: Generation is deferred until the caller consumes the stream
+        metadata = {
+            'retrieved_chunks': len(results),
+            'model': self.model,
+            'query': query
+        }
+        messages = self._create_messages(query, context)
+        
+        return {
+            'answer': self._stream_tokens(messages, query_embedding, results, metadata),
+            'sources': results if return_sources else [],
+            'metadata': metadata
+        }
+    
+    @staticmethod
+    def _single_chunk(text: str):
+        """Wrap a complete answer as a one-chunk stream"""
+        yield text
+    
+    def _stream_tokens(self, messages: List[Dict[str, str]], query_embedding, results: List[Dict[str, Any]], metadata: Dict[str, Any]):
+        """Yield answer text from Groq as it is generated"""
+        logger.debug("Generating answer with %s...", self.model)
+        parts = []
+        
+        try:
+            stream = self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=self.temperature,
+                max_tokens=512,
+                stream=True
+            )
+            
+            for chunk in stream:
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    parts.append(delta)
+                    yield delta
+            
+        except Exception as e:
+            logger.error("Generation error: %s", e)
+            yield f"Error generating answer: {str(e)}"
+            return
+        
+        if self.cache is not None:
+            self.cache.add(query_embedding, {
+                'answer': "".join(parts).strip(),
+                'sources': results,
+                'metadata': metadata
+            })
+    
     def chat(self):
         """Interactive chat loop"""
         print("\n" + "=" * 50)
@@ -166,6 +265,7 @@ def main():
     parser.add_argument("--api-key", help="Groq API key (or set GROQ_API_KEY env var)")
     
     args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     
     # Get API key
     api_key = args.api_key or os.getenv("GROQ_API_KEY")
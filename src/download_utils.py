@@ -0,0 +1,144 @@
+"""
+Download Utilities
+Shared helpers for fetching open-access papers in parallel
+"""
+
+import json
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Any
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+CHUNK_SIZE = 1024 * 1024  # 1 MiB
+
+
+def create_session() -> requests.Session:
+    """Create an HTTP session with a connection pool shared by all workers"""
+    session = requests.Session()
+    retry = Retry(
+        total=3,
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=("HEAD", "GET")
+    )
+    adapter = HTTPAdapter(pool_connections=8, pool_maxsize=16, max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def _meta_path(filepath: Path) -> Path:
+    return filepath.with_name(filepath.name + ".meta.json")
+
+
+def _load_meta(filepath: Path) -> Dict[str, Any]:
+    """Load the HTTP validators saved next to a downloaded file"""
+    try:
+        return json.loads(_meta_path(filepath).read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_meta(filepath: Path, response: requests.Response):
+    """Save the HTTP validators of a response next to the downloaded file"""
+    meta = {
+        'etag': response.headers.get("ETag"),
+        'last_modified': response.headers.get("Last-Modified"),
+        'content_length': filepath.stat().st_size
+    }
+    _meta_path(filepath).write_text(json.dumps(meta))
+
+
+def _is_unchanged(session: requests.Session, url: str, filepath: Path, meta: Dict[str, Any]) -> bool:
+    """Check with a HEAD request whether the local copy matches the server"""
+    try:
+        head = session.head(url, allow_redirects=True, timeout=30)
+        head.raise_for_status()
+    except Exception:
+        return False
+
+    etag = head.headers.get("ETag")
+    if etag and meta.get('etag'):
+        return etag == meta['etag']
+
+    length = head.headers.get("Content-Length")
+    if length is not None:
+        return int(length) == filepath.stat().st_size
+
+    return False
+
+
+def download_paper(session: requests.Session, url: str, filename: str, data_dir: Path) -> bool:
+    """Download a single paper, skipping it if the local copy is up to date"""
+    filepath = data_dir / filename
+    headers = {}
+
+    if filepath.exists():
+        meta = _load_meta(filepath)
+        if _is_unchanged(session, url, filepath, meta):
+            print(f"⚠ {filename} already up to date, skipping...")
+            return False
+
+        # Let the server answer 304 if the HEAD check was inconclusive
+        if meta.get('etag'):
+            headers["If-None-Match"] = meta['etag']
+        if meta.get('last_modified'):
+            headers["If-Modified-Since"] = meta['last_modified']
+
+    # Write to a temporary file so an interrupted download is never mistaken
+    # for a complete one on the next run
+    partial = filepath.with_name(filepath.name + ".part")
+
+    try:
+        print(f"Downloading {filename}...")
+        with session.get(url, headers=headers, stream=True, timeout=60) as response:
+            if response.status_code == 304:
+                print(f"⚠ {filename} not modified, skipping...")
+                return False
+
+            response.raise_for_status()
+            with open(partial, "wb") as f:
+                for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                    f.write(chunk)
+
+            partial.replace(filepath)
+            _save_meta(filepath, response)
+
+        size_mb = filepath.stat().st_size / (1024 * 1024)
+        print(f"✓ Downloaded {filename} ({size_mb:.1f} MB)")
+        return True
+    except Exception as e:
+        partial.unlink(missing_ok=True)
+        print(f"✗ Failed to download {filename}: {str(e)}")
+        return False
+
+
+def download_papers(papers: Dict[str, str], data_dir: Path, max_workers: int = 8) -> int:
+    """
+    Download papers concurrently
+
+    Args:
+        papers: Mapping of filename -> URL
+        data_dir: Directory to save the PDFs in
+        max_workers: Maximum number of parallel downloads
+
+    Returns:
+        Number of papers downloaded
+    """
+    if not papers:
+        return 0
+
+    session = create_session()
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(papers))) as ex:
+        results = list(ex.map(
+            lambda item: download_paper(session, item[1], item[0], data_dir),
+            papers.items()
+        ))
+
+    session.close()
+    return sum(results)
@@ -0,0 +1,253 @@
+"""
+Embedding Model Loader
+Runs the sentence-transformers embedding model as an INT8-quantized ONNX
+graph on CPU and shares one instance per model name across the process
+"""
+
+import functools
+import logging
+import os
+import shutil
+import threading
+from pathlib import Path
+from typing import List
+
+import numpy as np
+import onnxruntime as ort
+from tokenizers import Tokenizer
+from langchain_core.embeddings import Embeddings
+
+try:
+    from numba import njit
+except ImportError:  # optional: pooling falls back to NumPy
+    njit = None
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+# Exported ONNX models are cached in <repo>/models, whatever the working
+# directory (override with ONNX_MODEL_DIR)
+MODEL_CACHE_DIR = Path(os.getenv("ONNX_MODEL_DIR", Path(__file__).resolve().parent.parent / "models"))
+
+# Dynamic quantization target; "avx2" runs on any x86-64 CPU from the last decade
+QUANTIZATION_CONFIG = "avx2"
+
+# Optional fixed sequence length (override with ONNX_FIXED_SEQ_LEN): every
+# input is padded/truncated to it and the graph is specialized for that shape
+FIXED_SEQ_LEN = int(os.getenv("ONNX_FIXED_SEQ_LEN", "0")) or None
+
+
+def _masked_sum_normalize_kernel(hidden, mask, out):
+    """Fused masked sum over tokens + L2 normalization, one pass per row"""
+    batch, seq_len, dim = hidden.shape
+    for b in range(batch):
+        for d in range(dim):
+            out[b, d] = 0.0
+        for t in range(seq_len):
+            if mask[b, t]:
+                for d in range(dim):
+                    out[b, d] += hidden[b, t, d]
+        sq = 0.0
+        for d in range(dim):
+            sq += out[b, d] * out[b, d]
+        if sq > 0.0:
+            inv_norm = 1.0 / np.sqrt(sq)
+            for d in range(dim):
+                out[b, d] *= inv_norm
+
+
+# Compiled serially (queries are batch 1, and a parallel layer is unsafe
+# across threads and forked workers) and cached on disk when possible;
+# read-only deploys have no writable cache location, so compile per process
+_masked_sum_normalize = None
+if njit is not None:
+    try:
+        _masked_sum_normalize = njit(cache=True, fastmath=True)(_masked_sum_normalize_kernel)
+    except RuntimeError:
+        _masked_sum_normalize = njit(fastmath=True)(_masked_sum_normalize_kernel)
+
+
+def _numpy_mean_pool_normalize(hidden: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+    """NumPy version of mean_pool_normalize (used when Numba is not installed)"""
+    # Batched (1, T) @ (T, D) products: no (B, T, D) temporaries
+    mask = attention_mask.astype(np.float32)[:, None, :]
+    pooled = np.matmul(mask, hidden)[:, 0, :]
+    pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+    return pooled
+
+
+def mean_pool_normalize(hidden: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+    """
+    Mean-pool token vectors over real tokens, then L2-normalize
+
+    Same result as the sentence-transformers Pooling + Normalize modules. The
+    division by the token count cancels under normalization, so only the
+    masked sum is computed.
+
+    Args:
+        hidden: Last hidden state, shape (batch, seq_len, dim)
+        attention_mask: 1 for real tokens, 0 for padding, shape (batch, seq_len)
+
+    Returns:
+        float32 array of unit vectors, shape (batch, dim)
+    """
+    hidden = np.ascontiguousarray(hidden, dtype=np.float32)
+
+    if _masked_sum_normalize is None:
+        return _numpy_mean_pool_normalize(hidden, attention_mask)
+
+    out = np.empty((hidden.shape[0], hidden.shape[2]), dtype=np.float32)
+    _masked_sum_normalize(hidden, attention_mask, out)
+    return out
+
+
+class OnnxEmbeddings(Embeddings):
+    def __init__(
+        self,
+        model_name: str = DEFAULT_EMBEDDING_MODEL,
+        cache_dir: Path = MODEL_CACHE_DIR,
+        batch_size: int = 32,
+        max_length: int = 256,
+        fixed_seq_len: int = FIXED_SEQ_LEN,
+        num_threads: int = None
+    ):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.num_threads = num_threads
+        self.max_length = fixed_seq_len or max_length
+        self.fixed_seq_len = fixed_seq_len
+        self.model_dir = Path(cache_dir) / model_name.replace("/", "__")
+        self.onnx_path = self.model_dir / "onnx" / f"model_qint8_{QUANTIZATION_CONFIG}.onnx"
+
+        # The tokenizer and ONNX session are created on first use, so building
+        # a Retriever (or reading its stats) does not pay for the model load
+        self.tokenizer = None
+        self.session = None
+        self._load_lock = threading.Lock()
+
+    def _load(self):
+        """Load the tokenizer and ONNX session (exporting the model if needed)"""
+        with self._load_lock:
+            if self.session is not None:
+                return
+
+            logger.info("Loading embedding model: %s", self.model_name)
+            self.ensure_exported()
+
+            # Rust tokenizer: encode_batch fans out across all cores outside the GIL.
+            # Padding is done per model batch in _embed, not across the whole call
+            tokenizer = Tokenizer.from_file(str(self.model_dir / "tokenizer.json"))
+            tokenizer.enable_truncation(max_length=self.max_length)
+            tokenizer.no_padding()
+
+            so = ort.SessionOptions()
+            so.intra_op_num_threads = self.num_threads or os.cpu_count() or 1
+            so.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            if self.fixed_seq_len:
+                # Pin the exported dynamic axis so ORT optimizes for one static
+                # sequence length (shape-specialized kernels, folded shape ops)
+                so.add_free_dimension_override_by_name("sequence_length", self.fixed_seq_len)
+            session = ort.InferenceSession(
+                str(self.onnx_path),
+                sess_options=so,
+                providers=["CPUExecutionProvider"]
+            )
+
+            self._input_names = {i.name for i in session.get_inputs()}
+            self.tokenizer = tokenizer
+            self.session = session
+
+    def ensure_exported(self):
+        """Export the quantized ONNX model unless it is already cached"""
+        if not self.onnx_path.exists():
+            self._export()
+
+    def _export(self):
+        """Export the model to ONNX and quantize its Linear layers to INT8 (one-time)"""
+        from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+
+        logger.info("Exporting %s to quantized ONNX (one-time)...", self.model_name)
+
+        # Export into a temporary directory and rename it into place, so an
+        # interrupted export never leaves a model_dir that looks complete
+        tmp_dir = self.model_dir.with_name(f"{self.model_dir.name}.tmp-{os.getpid()}")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        try:
+            model = SentenceTransformer(self.model_name, backend="onnx", device="cpu")
+            model.save_pretrained(str(tmp_dir))
+            export_dynamic_quantized_onnx_model(model, QUANTIZATION_CONFIG, str(tmp_dir))
+
+            if self.onnx_path.exists():
+                # Another process finished the same export first
+                return
+            shutil.rmtree(self.model_dir, ignore_errors=True)
+            tmp_dir.rename(self.model_dir)
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        logger.info("✓ Saved quantized model to %s", self.onnx_path)
+
+    def _embed(self, texts: List[str], batch_size: int = None) -> np.ndarray:
+        """Embed texts into L2-normalized float32 vectors"""
+        if self.session is None:
+            self._load()
+
+        batch_size = batch_size or self.batch_size
+        vectors = []
+
+        # Tokenize everything in one parallel call, then pad each model batch
+        # only to its own longest sequence, or to the fixed length (pad id is 0)
+        all_encodings = self.tokenizer.encode_batch(texts)
+
+        for start in range(0, len(all_encodings), batch_size):
+            encodings = all_encodings[start:start + batch_size]
+            max_len = self.fixed_seq_len or max(len(e.ids) for e in encodings)
+            input_ids = np.zeros((len(encodings), max_len), dtype=np.int64)
+            attention_mask = np.zeros((len(encodings), max_len), dtype=np.int64)
+            token_type_ids = np.zeros((len(encodings), max_len), dtype=np.int64)
+            for row, e in enumerate(encodings):
+                input_ids[row, :len(e.ids)] = e.ids
+                attention_mask[row, :len(e.ids)] = e.attention_mask
+                token_type_ids[row, :len(e.ids)] = e.type_ids
+
+            feeds = {'input_ids': input_ids, 'attention_mask': attention_mask}
+            if 'token_type_ids' in self._input_names:
+                feeds['token_type_ids'] = token_type_ids
+
+            hidden = self.session.run(None, feeds)[0]  # last_hidden_state (B, T, D)
+
+            vectors.append(mean_pool_normalize(hidden, attention_mask))
+
+        if not vectors:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        return np.vstack(vectors)
+
+    def embed_array(self, texts: List[str], batch_size: int = None) -> np.ndarray:
+        """Embed a list of documents into a (len(texts), dim) float32 array"""
+        return self._embed(texts, batch_size)
+
+    def embed_documents(self, texts: List[str], batch_size: int = None) -> List[List[float]]:
+        """Embed a list of documents"""
+        return self.embed_array(texts, batch_size).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a single query"""
+        return self._embed([text])[0].tolist()
+
+
+@functools.lru_cache(maxsize=4)
+def get_embedder(model_name: str = DEFAULT_EMBEDDING_MODEL):
+    """
+    Get the shared embedding model for a model name
+
+    Args:
+        model_name: HuggingFace model name
+
+    Returns:
+        LangChain embeddings object shared by every caller using this model
+        (the model itself is loaded lazily on the first embed call)
+    """
+    return OnnxEmbeddings(model_name)
@@ -3,15 +3,115 @@ Document Ingestion Pipeline
 Loads PDFs, chunks them, creates embeddings, and stores in FAISS
 """
 
+import bisect
+import functools
+import json
+import logging
 import os
+import random
+import re
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import Pool
 from pathlib import Path
 from typing import List
-import pickle
 
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import PyPDFLoader, DirectoryLoader
+import faiss
+import numpy as np
+
+from langchain_core.documents import Document
+from langchain_community.document_loaders import PyPDFLoader
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_community.vectorstores import FAISS
-from langchain_community.embeddings import HuggingFaceEmbeddings
+from langchain_community.vectorstores.utils import DistanceStrategy
+
+from embedder import OnnxEmbeddings, get_embedder
+
+logger = logging.getLogger(__name__)
+
+
+# Supported FAISS index layouts (see DocumentIngestor._create_index)
+INDEX_TYPES = ("hnsw", "hnsw_fp16", "hnsw_sq8", "fp16", "sq8", "flat")
+
+# Chunks embedded and added to the index per step during ingestion
+INDEX_ADD_BATCH = 1024
+
+# Index types whose scalar quantizer is trained, and how many chunks (drawn
+# from the whole corpus) their per-dimension ranges are learned from
+TRAINED_INDEX_TYPES = ("hnsw_sq8", "sq8")
+INDEX_TRAIN_SAMPLE = 4096
+
+# Candidate chunk boundaries: paragraph, line or word breaks
+_BREAK_RE = re.compile(r"\n\n|\n| ")
+
+
+def fast_split(text: str, chunk_size: int, chunk_overlap: int) -> List[str]:
+    """
+    Split text into chunks of at most chunk_size characters
+    
+    All break positions are found in one regex sweep; each chunk then ends at
+    the last break that fits (or is cut at chunk_size if there is none), and
+    the next chunk starts about chunk_overlap characters earlier, on a break
+    (or right where the previous one ended if no break is that close).
+    
+    Args:
+        text: Text to split
+        chunk_size: Maximum chunk length in characters
+        chunk_overlap: Characters shared by consecutive chunks
+        
+    Returns:
+        List of non-empty, whitespace-stripped chunks
+    """
+    breaks = [m.end() for m in _BREAK_RE.finditer(text)]
+    n = len(text)
+    chunks = []
+    start = 0
+    
+    while start < n:
+        limit = start + chunk_size
+        if limit >= n:
+            end = n
+        else:
+            i = bisect.bisect_right(breaks, limit) - 1
+            end = breaks[i] if i >= 0 and breaks[i] > start else limit
+        
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append(chunk)
+        
+        if end >= n:
+            break
+        
+        # Step back by the overlap, snapping forward to the next word boundary;
+        # with no boundary inside the overlap, start at end rather than mid-word
+        j = bisect.bisect_left(breaks, end - chunk_overlap)
+        next_start = breaks[j] if j < len(breaks) and breaks[j] < end else end
+        start = next_start if next_start > start else end
+    
+    return chunks
+
+
+def _init_worker():
+    """Keep each pool worker single-threaded (tokenizer, Numba and ORT alike)"""
+    os.environ["RAYON_NUM_THREADS"] = "1"
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+    try:
+        import numba
+        numba.set_num_threads(1)
+    except ImportError:
+        pass
+
+
+@functools.lru_cache(maxsize=1)
+def _shard_embedder(model_name: str) -> OnnxEmbeddings:
+    """Per-process embedder for pool workers (one ORT thread each)"""
+    return OnnxEmbeddings(model_name=model_name, num_threads=1)
+
+
+def _embed_shard(args) -> np.ndarray:
+    """Embed one shard of texts in a worker process"""
+    model_name, texts, batch_size = args
+    return _shard_embedder(model_name).embed_array(texts, batch_size=batch_size)
 
 
 class DocumentIngestor:
@@ -21,99 +121,244 @@ class DocumentIngestor:
         vectorstore_dir: str = "vectorstore",
         chunk_size: int = 1000,
         chunk_overlap: int = 200,
-        embedding_model: str = "sentence-transformers/all-MiniLM-L6-v2"
+        embedding_model: str = "sentence-transformers/all-MiniLM-L6-v2",
+        index_type: str = "hnsw",
+        batch_size: int = 64,
+        num_workers: int = 1
     ):
         self.data_dir = Path(data_dir)
         self.vectorstore_dir = Path(vectorstore_dir)
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown index type: {index_type} (choose from {', '.join(INDEX_TYPES)})")
+        self.index_type = index_type
+        self.batch_size = batch_size
+        self.embedding_model = embedding_model
+        self.num_workers = num_workers
         
-        # Initialize embeddings (runs locally, no API needed)
-        print(f"Loading embedding model: {embedding_model}")
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name=embedding_model,
-            model_kwargs={'device': 'cpu'}
-        )
-        
-        # Text splitter
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=chunk_size,
-            chunk_overlap=chunk_overlap,
-            length_function=len,
-            separators=["\n\n", "\n", " ", ""]
-        )
+        # Initialize embeddings (runs locally, no API needed; INT8 ONNX on CPU,
+        # shared with any Retriever in the same process)
+        self.embeddings = get_embedder(embedding_model)
         
     def load_documents(self) -> List:
         """Load all PDF documents from data directory"""
-        print(f"Loading documents from {self.data_dir}...")
+        logger.info("Loading documents from %s...", self.data_dir)
         
         if not self.data_dir.exists():
             raise FileNotFoundError(f"Data directory not found: {self.data_dir}")
         
-        # Load PDFs
-        loader = DirectoryLoader(
-            str(self.data_dir),
-            glob="**/*.pdf",
-            loader_cls=PyPDFLoader,
-            show_progress=True
-        )
+        # Load PDFs in parallel: parsing mixes file I/O with pypdf work, so
+        # threads overlap reads across files
+        paths = sorted(self.data_dir.glob("**/*.pdf"))
+        if not paths:
+            return []
+        
+        with ThreadPoolExecutor(max_workers=min(16, len(paths))) as ex:
+            pages = list(ex.map(lambda path: PyPDFLoader(str(path)).load(), paths))
         
-        documents = loader.load()
-        print(f"Loaded {len(documents)} document pages")
+        documents = [page for file_pages in pages for page in file_pages]
+        logger.info("Loaded %d document pages from %d files", len(documents), len(paths))
         
         return documents
     
     def chunk_documents(self, documents: List) -> List:
         """Split documents into chunks"""
-        print("Chunking documents...")
-        chunks = self.text_splitter.split_documents(documents)
-        print(f"Created {len(chunks)} chunks")
+        logger.info("Chunking documents...")
+        chunks = [
+            Document(page_content=piece, metadata=dict(doc.metadata))
+            for doc in documents
+            for piece in fast_split(doc.page_content, self.chunk_size, self.chunk_overlap)
+        ]
+        logger.info("Created %d chunks", len(chunks))
         
         return chunks
     
+    def _embed_texts(self, texts: List[str], pool=None) -> np.ndarray:
+        """
+        Embed texts in length-sorted batches so each batch pads to similar lengths
+        
+        With a worker pool, the sorted texts are dealt out round-robin (so every
+        worker gets a similar mix of lengths) and embedded in separate processes
+        """
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        sorted_texts = [texts[i] for i in order]
+        
+        if pool is None:
+            sorted_vectors = self.embeddings.embed_array(sorted_texts, batch_size=self.batch_size)
+        else:
+            n = min(self.num_workers, len(sorted_texts))
+            shards = [(self.embedding_model, sorted_texts[w::n], self.batch_size) for w in range(n)]
+            shard_vectors = pool.map(_embed_shard, shards)
+            
+            # Interleave the strided shards back into sorted order
+            sorted_vectors = np.empty((len(sorted_texts), shard_vectors[0].shape[1]), dtype=np.float32)
+            for w, vecs in enumerate(shard_vectors):
+                sorted_vectors[w::n] = vecs
+        
+        # Restore the original chunk order
+        vectors = np.empty_like(sorted_vectors)
+        vectors[order] = sorted_vectors
+        return vectors
+    
     def create_vectorstore(self, chunks: List):
-        """Create FAISS vector store from chunks"""
-        print("Creating embeddings and vector store...")
-        print("This may take a few minutes depending on document size...")
+        """
+        Create FAISS vector store from chunks
+        
+        Chunks are embedded and added to the index INDEX_ADD_BATCH at a time,
+        so only one batch of vectors is held in memory
+        """
+        logger.info("Creating embeddings and vector store...")
+        logger.info("This may take a few minutes depending on document size...")
+        
+        index = None
+        docstore = InMemoryDocstore({})
+        index_to_docstore_id = {}
+        
+        # Worker processes each run their own single-threaded ORT session;
+        # export the model once here so they do not race to create it
+        pool = None
+        if self.num_workers > 1:
+            self.embeddings.ensure_exported()
+            pool = Pool(self.num_workers, initializer=_init_worker)
+        
+        try:
+            # Train 8-bit quantizers on a sample of the whole corpus, not just
+            # the first batch (which only covers the first few files)
+            if self.index_type in TRAINED_INDEX_TYPES and chunks:
+                sample = random.Random(0).sample(chunks, min(INDEX_TRAIN_SAMPLE, len(chunks)))
+                logger.info("Training %s quantizer on %d sampled chunks...", self.index_type, len(sample))
+                index = self._create_index(self._embed_texts([chunk.page_content for chunk in sample], pool))
+            
+            for start in range(0, len(chunks), INDEX_ADD_BATCH):
+                batch = chunks[start:start + INDEX_ADD_BATCH]
+                vectors = self._embed_texts([chunk.page_content for chunk in batch], pool)
+                
+                if index is None:
+                    index = self._create_index(vectors)
+                index.add(vectors)
+                
+                ids = [str(uuid.uuid4()) for _ in batch]
+                docstore.add(dict(zip(ids, batch)))
+                index_to_docstore_id.update(zip(range(start, start + len(batch)), ids))
+                logger.info("  Indexed %d/%d chunks", start + len(batch), len(chunks))
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
         
-        vectorstore = FAISS.from_documents(
-            documents=chunks,
-            embedding=self.embeddings
+        vectorstore = FAISS(
+            embedding_function=self.embeddings,
+            index=index,
+            docstore=docstore,
+            index_to_docstore_id=index_to_docstore_id,
+            distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT
         )
         
         return vectorstore
     
+    def _create_index(self, sample: np.ndarray):
+        """
+        Create the FAISS index selected by index_type
+        
+        Embeddings are L2-normalized, so every index uses inner product:
+        scores are cosine similarities and flat scans run as BLAS sgemm
+        
+        Args:
+            sample: Vectors that set the dimension and train the quantizer
+                (a corpus-wide sample for TRAINED_INDEX_TYPES, otherwise the
+                first batch)
+        """
+        dim = sample.shape[1]
+        
+        if self.index_type == "hnsw":
+            # Graph search, O(log N) per query
+            index = faiss.IndexHNSWFlat(dim, 32, faiss.METRIC_INNER_PRODUCT)
+            index.hnsw.efConstruction = 200
+        elif self.index_type == "hnsw_fp16":
+            # HNSW graph over float16 vectors: half the memory of float32, and
+            # the rounding is far below the gap between neighbouring scores
+            index = faiss.IndexHNSWSQ(dim, faiss.ScalarQuantizer.QT_fp16, 32, faiss.METRIC_INNER_PRODUCT)
+            index.hnsw.efConstruction = 200
+        elif self.index_type == "hnsw_sq8":
+            # HNSW graph over 8-bit scalar-quantized vectors: 4x smaller than
+            # float32 and faster to scan, at a small recall cost
+            index = faiss.IndexHNSWSQ(dim, faiss.ScalarQuantizer.QT_8bit, 32, faiss.METRIC_INNER_PRODUCT)
+            index.hnsw.efConstruction = 200
+            index.train(sample)
+        elif self.index_type == "fp16":
+            # Exact scan over float16 vectors (upcast to float32 while scoring)
+            index = faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_fp16, faiss.METRIC_INNER_PRODUCT)
+        elif self.index_type == "sq8":
+            # Exact scan over 8-bit codes: 1 byte per dimension instead of 4,
+            # so the memory-bound scan reads 4x less
+            index = faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_INNER_PRODUCT)
+            index.train(sample)
+        else:
+            index = faiss.IndexFlatIP(dim)
+        
+        return index
+    
     def save_vectorstore(self, vectorstore):
         """Save vector store to disk"""
         self.vectorstore_dir.mkdir(exist_ok=True, parents=True)
         
-        print(f"Saving vector store to {self.vectorstore_dir}...")
-        vectorstore.save_local(str(self.vectorstore_dir))
+        logger.info("Saving vector store to %s...", self.vectorstore_dir)
+        
+        # Raw FAISS index (memory-mapped by the Retriever) plus the chunks as
+        # JSON in index order, instead of LangChain's pickled docstore
+        index_tmp = self._tmp_path("index.faiss")
+        faiss.write_index(vectorstore.index, str(index_tmp))
+        
+        ids = [vectorstore.index_to_docstore_id[i] for i in range(vectorstore.index.ntotal)]
+        documents = [vectorstore.docstore.search(doc_id) for doc_id in ids]
+        docstore = {
+            'ids': ids,
+            'documents': [
+                {'page_content': doc.page_content, 'metadata': doc.metadata}
+                for doc in documents
+            ]
+        }
+        docstore_tmp = self._tmp_path("docstore.json")
+        docstore_tmp.write_text(json.dumps(docstore, default=str))
         
         # Save metadata
         metadata = {
             'num_chunks': vectorstore.index.ntotal,
             'chunk_size': self.chunk_size,
-            'chunk_overlap': self.chunk_overlap
+            'chunk_overlap': self.chunk_overlap,
+            'index_type': self.index_type
         }
         
-        with open(self.vectorstore_dir / "metadata.pkl", "wb") as f:
-            pickle.dump(metadata, f)
+        metadata_tmp = self._tmp_path("metadata.json")
+        metadata_tmp.write_text(json.dumps(metadata))
+        
+        # Swap the new files in only once all are written. os.replace gives the
+        # old index a new inode rather than rewriting it, so a running app that
+        # has it memory-mapped keeps reading the old file instead of crashing.
+        # metadata.json goes last: it marks the store as complete
+        os.replace(index_tmp, self.vectorstore_dir / "index.faiss")
+        os.replace(docstore_tmp, self.vectorstore_dir / "docstore.json")
+        os.replace(metadata_tmp, self.vectorstore_dir / "metadata.json")
         
-        print(f"✓ Vector store saved with {metadata['num_chunks']} chunks")
+        logger.info("✓ Vector store saved with %d chunks", metadata['num_chunks'])
+    
+    def _tmp_path(self, name: str) -> Path:
+        """Temporary file next to its final location (same filesystem for os.replace)"""
+        return self.vectorstore_dir / f".{name}.tmp-{os.getpid()}"
     
     def ingest(self):
         """Run full ingestion pipeline"""
-        print("=" * 50)
-        print("Starting Document Ingestion Pipeline")
-        print("=" * 50)
+        logger.info("=" * 50)
+        logger.info("Starting Document Ingestion Pipeline")
+        logger.info("=" * 50)
         
         try:
             # Step 1: Load documents
             documents = self.load_documents()
             
             if len(documents) == 0:
-                print("⚠ No documents found. Please add PDF files to the data/ directory")
+                logger.warning("⚠ No documents found. Please add PDF files to the data/ directory")
                 return
             
             # Step 2: Chunk documents
@@ -125,12 +370,12 @@ class DocumentIngestor:
             # Step 4: Save to disk
             self.save_vectorstore(vectorstore)
             
-            print("\n" + "=" * 50)
-            print("✓ Ingestion Complete!")
-            print("=" * 50)
+            logger.info("=" * 50)
+            logger.info("✓ Ingestion Complete!")
+            logger.info("=" * 50)
             
         except Exception as e:
-            print(f"\n✗ Error during ingestion: {str(e)}")
+            logger.error("✗ Error during ingestion: %s", e)
             raise
 
 
@@ -143,14 +388,36 @@ def main():
     parser.add_argument("--vectorstore-dir", default="vectorstore", help="Output directory for vector store")
     parser.add_argument("--chunk-size", type=int, default=1000, help="Chunk size for text splitting")
     parser.add_argument("--chunk-overlap", type=int, default=200, help="Overlap between chunks")
+    parser.add_argument(
+        "--index-type",
+        choices=INDEX_TYPES,
+        default="hnsw",
+        help="FAISS index layout: hnsw (graph search), hnsw_fp16 / hnsw_sq8 (HNSW over float16 / 8-bit codes), fp16 / sq8 (exact scan over float16 / 8-bit codes), flat (exact scan)"
+    )
+    parser.add_argument(
+        "--quantize",
+        action="store_true",
+        help="Shorthand for --index-type hnsw_sq8 (~4x smaller index, faster search)"
+    )
+    parser.add_argument("--batch-size", type=int, default=64, help="Embedding batch size")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Embedding worker processes (1 = embed in-process; up to the number of CPU cores)"
+    )
     
     args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     
     ingestor = DocumentIngestor(
         data_dir=args.data_dir,
         vectorstore_dir=args.vectorstore_dir,
         chunk_size=args.chunk_size,
-        chunk_overlap=args.chunk_overlap
+        chunk_overlap=args.chunk_overlap,
+        index_type="hnsw_sq8" if args.quantize else args.index_type,
+        batch_size=args.batch_size,
+        num_workers=args.workers
     )
     
     ingestor.ingest()
@@ -0,0 +1,69 @@
+"""
+Prompt Templates
+Shared system instructions and message builders for the RAG chatbots
+"""
+
+import hashlib
+from typing import List, Dict, Any, Tuple
+
+
+# Static instructions, sent once as the system message so they form a
+# stable (cacheable) prefix instead of being rebuilt into every prompt
+SYSTEM_MSG = "\n".join([
+    "You are a helpful research assistant. Answer the question based on the provided context from research papers.",
+    "",
+    "Instructions:",
+    "- Answer based ONLY on the information in the context",
+    "- If the context doesn't contain enough information to answer, say so",
+    "- Be concise but comprehensive",
+    "- Cite specific details from the context when relevant",
+])
+
+
+def build_context(results: List[Dict[str, Any]], max_context_chars: int = 6000) -> Tuple[str, List[Dict[str, Any]]]:
+    """
+    Build the numbered context block from retrieved chunks
+    
+    Args:
+        results: Retrieved chunks (dicts with 'content')
+        max_context_chars: Character budget shared by all chunks (None = no limit)
+        
+    Returns:
+        (context, kept) - the context string with near-duplicate chunks removed
+        and each chunk trimmed, and the kept chunks in [Source N] order (return
+        these as the sources so the numbering matches the answer)
+    """
+    # Drop chunks whose opening text is identical (overlapping splits, repeated pages)
+    seen = set()
+    unique = []
+    for r in results:
+        key = hashlib.blake2b(r['content'][:256].encode('utf-8'), digest_size=16).digest()
+        if key not in seen:
+            seen.add(key)
+            unique.append(r)
+    
+    budget = max_context_chars // len(unique) if max_context_chars and unique else None
+    
+    context = "\n\n".join(
+        f"[Source {i}]: {r['content'][:budget]}"
+        for i, r in enumerate(unique, 1)
+    )
+    return context, unique
+
+
+# Static pieces of the user message, concatenated around the per-query parts
+USER_PREFIX = "Context:\n"
+QUESTION_PREFIX = "\n\nQuestion: "
+
+
+def create_user_message(query: str, context: str) -> str:
+    """Create the per-query part of the prompt"""
+    return USER_PREFIX + context + QUESTION_PREFIX + query
+
+
+def create_messages(query: str, context: str) -> List[Dict[str, str]]:
+    """Create chat messages (system + user) for chat-completion APIs"""
+    return [
+        {"role": "system", "content": SYSTEM_MSG},
+        {"role": "user", "content": create_user_message(query, context)}
+    ]
@@ -1,12 +1,21 @@
 # D:\mini-rag-chatbot\src\rag_core.py
 # This file contains the RAGChatbot class, adapted from your chatbot_groq.py
 
+import asyncio
+import logging
 from typing import List, Dict, Any
-from groq import Groq
+from groq import AsyncGroq
 # NOTE: This assumes 'retrieval.py' is in the 'src' folder
 from retrieval import Retriever 
+from cache import SemanticCache
+from prompts import build_context, create_messages
 import os
 
+logger = logging.getLogger(__name__)
+
+# Clients only display the start of each source chunk
+SOURCE_PREVIEW_CHARS = 300
+
 class RAGChatbot:
     def __init__(
         self,
@@ -14,56 +23,81 @@ class RAGChatbot:
         groq_api_key: str = None,
         model: str = "llama-3.2-3b-preview",
         top_k: int = 4,
-        temperature: float = 0.1
+        temperature: float = 0.1,
+        max_context_chars: int = 6000,
+        client: AsyncGroq = None,
+        use_cache: bool = True,
+        cache_threshold: float = 0.95,
+        retriever: Retriever = None
     ):
         self.model = model
         self.temperature = temperature
         self.top_k = top_k
+        self.max_context_chars = max_context_chars
         
-        # Initialize Groq client
-        if not groq_api_key:
-            # In Vercel, the key will be passed via the environment variable
-            groq_api_key = os.getenv("GROQ_API_KEY")
+        # Initialize Groq client (reuse a pooled client when one is passed in)
+        if client is None:
             if not groq_api_key:
-                raise ValueError("Please provide a Groq API key or set GROQ_API_KEY env var")
+                # In Vercel, the key will be passed via the environment variable
+                groq_api_key = os.getenv("GROQ_API_KEY")
+                if not groq_api_key:
+                    raise ValueError("Please provide a Groq API key or set GROQ_API_KEY env var")
+            
+            client = AsyncGroq(api_key=groq_api_key)
         
-        self.client = Groq(api_key=groq_api_key)
+        self.client = client
         
-        # Initialize retriever
-        print("Initializing retriever...")
-        # NOTE: Assuming Retriever is correctly defined in retrieval.py
-        self.retriever = Retriever(vectorstore_dir=vectorstore_dir, top_k=top_k)
+        # Initialize retriever (reuse an already loaded one when given)
+        if retriever is None:
+            logger.info("Initializing retriever...")
+            # NOTE: Assuming Retriever is correctly defined in retrieval.py
+            retriever = Retriever(vectorstore_dir=vectorstore_dir, top_k=top_k)
+        self.retriever = retriever
         
-        print(f"✓ RAG Chatbot ready with {self.model}")
-    
-    def _create_prompt(self, query: str, context: str) -> str:
-        """Create RAG prompt with context"""
-        prompt = f"""You are a helpful research assistant. Answer the question based on the provided context from research papers.
-
-Context from research papers:
-{context}
-
-Question: {query}
-
-Instructions:
-- Answer based ONLY on the information in the context above
-- If the context doesn't contain enough information to answer, say so
-- Be concise but comprehensive
-- Cite specific details from the context when relevant
-
-Answer:"""
+        # Semantic cache for repeated / near-duplicate questions
+        self.cache = SemanticCache(threshold=cache_threshold) if use_cache else None
+        
+        # Event loop for answer_sync; created on first use and kept, because the
+        # AsyncGroq connection pool stays bound to the loop it first ran on
+        self._loop = None
         
-        return prompt
+        logger.info("RAG Chatbot ready with %s", self.model)
+    
+    def _create_messages(self, query: str, context: str) -> List[Dict[str, str]]:
+        """Create RAG chat messages with context"""
+        return create_messages(query, context)
     
-    def answer(self, query: str, return_sources: bool = True) -> Dict[str, Any]:
+    @staticmethod
+    def _format_sources(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Trim sources to the displayed preview so full chunks never go over the wire"""
+        return [
+            {
+                'source': r['source'],
+                'score': r['score'],
+                'content': r['content'][:SOURCE_PREVIEW_CHARS],
+                'metadata': r['metadata']
+            }
+            for r in results
+        ]
+    
+    async def answer(self, query: str, return_sources: bool = True) -> Dict[str, Any]:
         """
         Answer a question using RAG
         """
-        print(f"\nProcessing query: {query}")
+        logger.debug("Processing query: %s", query)
+        
+        # Step 0: Check the semantic cache
+        query_embedding = None
+        if self.cache is not None:
+            query_embedding = await asyncio.to_thread(self.retriever.embed_query, query)
+            cached = self.cache.lookup_response(query_embedding, query, return_sources)
+            if cached is not None:
+                return cached
         
-        # Step 1: Retrieve relevant documents
-        print("Retrieving relevant documents...")
-        results = self.retriever.search(query, k=self.top_k)
+        # Step 1: Retrieve relevant documents in a worker thread so the event
+        # loop keeps serving other requests while the embedder runs
+        logger.debug("Retrieving relevant documents...")
+        results = await asyncio.to_thread(self.retriever.search, query, self.top_k, query_embedding)
         
         if not results:
             return {
@@ -73,35 +107,39 @@ Answer:"""
             }
         
         # Step 2: Create context
-        context = "\n\n".join([
-            f"[Source {i+1}]: {r['content']}" 
-            for i, r in enumerate(results)
-        ])
+        context, results = build_context(results, self.max_context_chars)
         
-        # Step 3: Generate answer with Groq
-        print(f"Generating answer with {self.model}...")
-        prompt = self._create_prompt(query, context)
+        # Step 3: Generate answer with Groq; the request is started first and
+        # the sources are formatted while the response is awaited
+        logger.debug("Generating answer with %s...", self.model)
+        messages = self._create_messages(query, context)
+        
+        completion = asyncio.create_task(self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=self.temperature,
+            max_tokens=512
+        ))
+        # Yield once so the task runs up to its first network wait (the
+        # request is on the wire) before the sources are formatted
+        await asyncio.sleep(0)
+        sources = self._format_sources(results)
         
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=self.temperature,
-                max_tokens=512
-            )
+            response = await completion
             
             answer = response.choices[0].message.content.strip()
+            generated = True
             
         except Exception as e:
             answer = f"Error generating answer: {str(e)}"
-            print(f"✗ Generation error: {str(e)}")
+            generated = False
+            logger.error("Generation error: %s", e)
         
         # Step 4: Format response
         response_data = {
             'answer': answer,
-            'sources': results if return_sources else [],
+            'sources': sources if return_sources else [],
             'metadata': {
                 'retrieved_chunks': len(results),
                 'model': self.model,
@@ -109,4 +147,107 @@ Answer:"""
             }
         }
         
+        if self.cache is not None and generated:
+            self.cache.add(query_embedding, {**response_data, 'sources': sources})
+        
         return response_data
+    
+    def answer_sync(self, query: str, return_sources: bool = True) -> Dict[str, Any]:
+        """
+        Blocking answer() for scripts and CLIs without an event loop
+        
+        Every call runs on the same per-bot loop. Do not mix with callers that
+        drive answer() on another loop (e.g. api/query.py's LOOP).
+        """
+        if self._loop is None:
+            self._loop = asyncio.new_event_loop()
+        return self._loop.run_until_complete(self.answer(query, return_sources))
+    
+    async def answer_stream(self, query: str, return_sources: bool = True) -> Dict[str, Any]:
+        """
+        Answer a question using RAG, streaming the generated text
+        
+        Args:
+            query: User question
+            return_sources: Whether to return source documents
+            
+        Returns:
+            Dict like answer(), except 'answer' is an async iterator of text chunks
+        """
+        logger.debug("Processing query (streaming): %s", query)
+        
+        # Step 0: Check the semantic cache
+        query_embedding = None
+        if self.cache is not None:
+            query_embedding = await asyncio.to_thread(self.retriever.embed_query, query)
+            cached = self.cache.lookup_response(query_embedding, query, return_sources)
+            if cached is not None:
+                cached['answer'] = self._single_chunk(cached['answer'])
+                return cached
+        
+        # Step 1: Retrieve relevant documents in a worker thread so the event
+        # loop keeps serving other requests while the embedder runs
+        logger.debug("Retrieving relevant documents...")
+        results = await asyncio.to_thread(self.retriever.search, query, self.top_k, query_embedding)
+        
+        if not results:
+            return {
+                'answer': self._single_chunk("I couldn't find any relevant information in the documents."),
+                'sources': [],
+                'metadata': {'retrieved_chunks': 0}
+            }
+        
+        # Step 2: Create context
+        context, results = build_context(results, self.max_context_chars)
+        sources = self._format_sources(results)
+        
+        # Step 3: Generation is deferred until the caller consumes the stream
+        metadata = {
+            'retrieved_chunks': len(results),
+            'model': self.model,
+            'query': query
+        }
+        messages = self._create_messages(query, context)
+        
+        return {
+            'answer': self._stream_tokens(messages, query_embedding, sources, metadata),
+            'sources': sources if return_sources else [],
+            'metadata': metadata
+        }
+    
+    @staticmethod
+    async def _single_chunk(text: str):
+        """Wrap a complete answer as a one-chunk stream"""
+        yield text
+    
+    async def _stream_tokens(self, messages: List[Dict[str, str]], query_embedding, sources: List[Dict[str, Any]], metadata: Dict[str, Any]):
+        """Yield answer text from Groq as it is generated"""
+        logger.debug("Generating answer with %s...", self.model)
+        parts = []
+        
+        try:
+            stream = await self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=self.temperature,
+                max_tokens=512,
+                stream=True
+            )
+            
+            async for chunk in stream:
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    parts.append(delta)
+                    yield delta
+            
+        except Exception as e:
+            logger.error("Generation error: %s", e)
+            yield f"Error generating answer: {str(e)}"
+            return
+        
+        if self.cache is not None:
+            self.cache.add(query_embedding, {
+                'answer': "".join(parts).strip(),
+                'sources': sources,
+                'metadata': metadata
+            })
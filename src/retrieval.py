@@ -3,33 +3,54 @@ Retrieval Module
 Handles semantic search and document retrieval from FAISS
 """
 
+import functools
+import logging
+import threading
+from collections import OrderedDict
 from pathlib import Path
 from typing import List, Dict, Any
-import pickle
+import json
 
+import faiss
+import numpy as np
+
+from langchain_core.documents import Document
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_community.vectorstores import FAISS
-from langchain_community.embeddings import HuggingFaceEmbeddings
+from langchain_community.vectorstores.utils import DistanceStrategy
+
+from embedder import DEFAULT_EMBEDDING_MODEL, get_embedder
+
+logger = logging.getLogger(__name__)
 
 
 class Retriever:
     def __init__(
         self,
         vectorstore_dir: str = "vectorstore",
-        embedding_model: str = "sentence-transformers/all-MiniLM-L6-v2",
-        top_k: int = 4
+        embedding_model: str = DEFAULT_EMBEDDING_MODEL,
+        top_k: int = 4,
+        embeddings=None,
+        vectorstore: FAISS = None,
+        cache_size: int = 1024
     ):
         self.vectorstore_dir = Path(vectorstore_dir)
+        self.embedding_model = embedding_model
         self.top_k = top_k
         
-        # Load embeddings (same model used during ingestion)
-        print(f"Loading embedding model: {embedding_model}")
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name=embedding_model,
-            model_kwargs={'device': 'cpu'}
-        )
+        # Repeated queries (chat retries, re-asked questions) skip the embedding
+        # pass and the index search
+        self._embed_query_cached = functools.lru_cache(maxsize=cache_size)(self._embed_query_uncached)
+        self._search_cache: OrderedDict = OrderedDict()
+        self._search_cache_size = cache_size
+        self._search_cache_lock = threading.Lock()
+        
+        # Load embeddings (same model used during ingestion); the model is
+        # shared with every other Retriever in the process unless injected
+        self.embeddings = embeddings if embeddings is not None else get_embedder(embedding_model)
         
-        # Load vector store
-        self.vectorstore = self._load_vectorstore()
+        # Load vector store (reuse an already loaded one when given)
+        self.vectorstore = vectorstore if vectorstore is not None else self._load_vectorstore()
         self.metadata = self._load_metadata()
         
     def _load_vectorstore(self):
@@ -40,33 +61,88 @@ class Retriever:
                 "Please run ingest.py first."
             )
         
-        print(f"Loading vector store from {self.vectorstore_dir}...")
-        vectorstore = FAISS.load_local(
-            str(self.vectorstore_dir),
-            self.embeddings,
-            allow_dangerous_deserialization=True
-        )
+        logger.info("Loading vector store from %s...", self.vectorstore_dir)
+        if (self.vectorstore_dir / "docstore.json").exists():
+            vectorstore = self._load_mmap_vectorstore()
+        else:
+            # Vector stores built before docstore.json was introduced
+            vectorstore = FAISS.load_local(
+                str(self.vectorstore_dir),
+                self.embeddings,
+                allow_dangerous_deserialization=True
+            )
+        
+        # Quantized / HNSW indexes are restored by faiss.read_index as-is;
+        # widen the HNSW search beam a little for better recall at k<=10
+        if hasattr(vectorstore.index, "hnsw"):
+            vectorstore.index.hnsw.efSearch = 64
+        
+        # The distance strategy is not saved with the index; for inner-product
+        # indexes scores are similarities (higher is better)
+        if vectorstore.index.metric_type == faiss.METRIC_INNER_PRODUCT:
+            vectorstore.distance_strategy = DistanceStrategy.MAX_INNER_PRODUCT
         
-        print(f"✓ Vector store loaded with {vectorstore.index.ntotal} chunks")
+        logger.info("✓ Vector store loaded with %d chunks", vectorstore.index.ntotal)
         return vectorstore
     
+    def _load_mmap_vectorstore(self) -> FAISS:
+        """
+        Open the saved index memory-mapped and rebuild the docstore from JSON
+        
+        The OS pages the index in on demand and shares the pages between
+        worker processes, so loading does not read the whole index up front.
+        """
+        index_path = str(self.vectorstore_dir / "index.faiss")
+        mmap_flag = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP)
+        try:
+            index = faiss.read_index(index_path, mmap_flag | faiss.IO_FLAG_READ_ONLY)
+        except RuntimeError:
+            # Index types without mmap support are read into memory
+            index = faiss.read_index(index_path)
+        
+        data = json.loads((self.vectorstore_dir / "docstore.json").read_text())
+        docstore = InMemoryDocstore({
+            doc_id: Document(page_content=doc['page_content'], metadata=doc['metadata'])
+            for doc_id, doc in zip(data['ids'], data['documents'])
+        })
+        
+        return FAISS(
+            embedding_function=self.embeddings,
+            index=index,
+            docstore=docstore,
+            index_to_docstore_id=dict(enumerate(data['ids']))
+        )
+    
     def _load_metadata(self) -> Dict[str, Any]:
         """Load metadata about the vector store"""
-        metadata_path = self.vectorstore_dir / "metadata.pkl"
-        
-        if metadata_path.exists():
-            with open(metadata_path, "rb") as f:
+        json_path = self.vectorstore_dir / "metadata.json"
+        if json_path.exists():
+            return json.loads(json_path.read_text())
+        
+        # Vector stores built before metadata.json was introduced
+        pickle_path = self.vectorstore_dir / "metadata.pkl"
+        if pickle_path.exists():
+            import pickle
+            with open(pickle_path, "rb") as f:
                 return pickle.load(f)
         
         return {}
     
-    def search(self, query: str, k: int = None) -> List[Dict[str, Any]]:
+    def _embed_query_uncached(self, query: str) -> tuple:
+        return tuple(self.embeddings.embed_query(query))
+    
+    def embed_query(self, query: str) -> np.ndarray:
+        """Embed a query with the same model used for the index (memoized)"""
+        return np.asarray(self._embed_query_cached(query), dtype=np.float32)
+    
+    def search(self, query: str, k: int = None, embedding=None) -> List[Dict[str, Any]]:
         """
         Perform semantic search
         
         Args:
             query: Search query
             k: Number of results to return (default: self.top_k)
+            embedding: Precomputed query embedding (skips embedding the query)
             
         Returns:
             List of dicts with 'content', 'metadata', and 'score'
@@ -74,20 +150,35 @@ class Retriever:
         if k is None:
             k = self.top_k
         
-        # Perform similarity search with scores
-        results = self.vectorstore.similarity_search_with_score(query, k=k)
+        key = (query, k)
+        with self._search_cache_lock:
+            if key in self._search_cache:
+                self._search_cache.move_to_end(key)
+                return list(self._search_cache[key])
+        
+        # Embed once and search by vector, so the embedder is the only
+        # tokenization/forward pass on the query path
+        if embedding is None:
+            embedding = self.embed_query(query)
+        results = self.vectorstore.similarity_search_with_score_by_vector(embedding, k=k)
         
         # Format results
-        formatted_results = []
-        for doc, score in results:
-            formatted_results.append({
+        formatted_results = [
+            {
                 'content': doc.page_content,
                 'metadata': doc.metadata,
                 'score': float(score),
                 'source': doc.metadata.get('source', 'Unknown')
-            })
+            }
+            for doc, score in results
+        ]
+        
+        with self._search_cache_lock:
+            self._search_cache[key] = formatted_results
+            if len(self._search_cache) > self._search_cache_size:
+                self._search_cache.popitem(last=False)
         
-        return formatted_results
+        return list(formatted_results)
     
     def get_context(self, query: str, k: int = None) -> str:
         """
@@ -102,11 +193,10 @@ class Retriever:
         """
         results = self.search(query, k=k)
         
-        context_parts = []
-        for i, result in enumerate(results, 1):
-            context_parts.append(f"[Document {i}]\n{result['content']}")
-        
-        return "\n\n".join(context_parts)
+        return "\n\n".join(
+            f"[Document {i}]\n{result['content']}"
+            for i, result in enumerate(results, 1)
+        )
     
     def get_stats(self) -> Dict[str, Any]:
         """Get statistics about the vector store"""
@@ -114,7 +204,8 @@ class Retriever:
             'total_chunks': self.vectorstore.index.ntotal,
             'chunk_size': self.metadata.get('chunk_size', 'Unknown'),
             'chunk_overlap': self.metadata.get('chunk_overlap', 'Unknown'),
-            'embedding_model': 'sentence-transformers/all-MiniLM-L6-v2'
+            'index_type': self.metadata.get('index_type', 'flat'),
+            'embedding_model': self.embedding_model
         }
 
 
@@ -128,6 +219,7 @@ def main():
     parser.add_argument("--vectorstore-dir", default="vectorstore", help="Vector store directory")
     
     args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     
     try:
         retriever = Retriever(
@@ -4,14 +4,212 @@ Run this to verify everything works end-to-end
 """
 
 import sys
+import time
 from pathlib import Path
 
+import numpy as np
+
 # Add src to path
 sys.path.insert(0, str(Path(__file__).parent / "src"))
 
-from ingest import DocumentIngestor
+from ingest import DocumentIngestor, fast_split
 from retrieval import Retriever
 from chatbot import RAGChatbot
+from cache import SemanticCache
+from prompts import build_context
+import embedder
+
+
+# One Retriever (vector store + embedding model) shared by every test;
+# created on first use, after test_ingestion has built the index
+_retriever = None
+
+
+def get_retriever() -> Retriever:
+    """Return the shared test Retriever, loading it on first call"""
+    global _retriever
+    if _retriever is None:
+        _retriever = Retriever(vectorstore_dir="vectorstore_test", top_k=4)
+    return _retriever
+
+
+def test_text_splitting():
+    """Test the chunk splitter (no data needed)"""
+    print("\n" + "=" * 60)
+    print("TEST 0a: Text Splitting")
+    print("=" * 60)
+    
+    try:
+        words = [f"word{i}" for i in range(2000)]
+        text = " ".join(words[:700]) + "\n\n" + "\n".join(words[700:1200]) + " " + " ".join(words[1200:])
+        chunks = fast_split(text, chunk_size=200, chunk_overlap=50)
+        
+        assert chunks, "no chunks produced"
+        assert all(len(c) <= 200 for c in chunks), "chunk longer than chunk_size"
+        print(f"✓ {len(chunks)} chunks, none longer than chunk_size")
+        
+        covered = set(w for c in chunks for w in c.split())
+        missing = [w for w in words if w not in covered]
+        assert not missing, f"words not in any chunk: {missing[:5]}"
+        print("✓ Every word is covered")
+        
+        for prev, nxt in zip(chunks, chunks[1:]):
+            assert nxt.split()[0] in prev.split(), "consecutive chunks do not overlap"
+        print("✓ Consecutive chunks overlap")
+        
+        # No break inside the overlap window: the next chunk must not start mid-word
+        chunks = fast_split("hello world foo bar baz", chunk_size=10, chunk_overlap=3)
+        assert chunks == ["hello", "world foo", "bar baz"], f"chunk started mid-word: {chunks}"
+        print("✓ Chunks never start mid-word")
+        
+        # No break characters at all: hard cuts at chunk_size
+        chunks = fast_split("x" * 2500, chunk_size=1000, chunk_overlap=200)
+        assert [len(c) for c in chunks] == [1000, 1000, 500], f"unexpected cuts: {[len(c) for c in chunks]}"
+        print("✓ Text without breaks is cut at chunk_size")
+        
+        # Overlap >= chunk size must still make progress
+        chunks = fast_split(" ".join(words[:300]), chunk_size=100, chunk_overlap=150)
+        assert chunks and all(len(c) <= 100 for c in chunks), "bad chunks with overlap >= chunk_size"
+        assert chunks[-1].split()[-1] == words[299], "splitting stopped early with overlap >= chunk_size"
+        print("✓ Overlap >= chunk_size terminates")
+        
+        print("\n✓ Text splitting test passed!")
+        return True
+        
+    except AssertionError as e:
+        print(f"✗ Text splitting test failed: {str(e)}")
+        return False
+
+
+def test_semantic_cache():
+    """Test the semantic answer cache (no data needed)"""
+    print("\n" + "=" * 60)
+    print("TEST 0b: Semantic Cache")
+    print("=" * 60)
+    
+    try:
+        a, b, c = np.eye(3, dtype=np.float32)
+        
+        # Hits at or above the threshold, misses below it
+        cache = SemanticCache(threshold=0.9, max_entries=4, ttl=None)
+        cache.add(a, {'answer': 'a'})
+        near = a + 0.4 * b  # cosine ~0.93
+        far = a + 1.0 * b   # cosine ~0.71
+        assert cache.lookup(near) == {'answer': 'a'}, "near-duplicate query missed"
+        assert cache.lookup(far) is None, "dissimilar query hit"
+        print("✓ Hit above the threshold, miss below it")
+        
+        # Hits come back as chatbot responses flagged as cache hits
+        cache.add(c, {'answer': 'c', 'sources': [{'source': 'x'}], 'metadata': {'model': 'm'}})
+        hit = cache.lookup_response(c, "question", return_sources=False)
+        assert hit == {'answer': 'c', 'sources': [], 'metadata': {'model': 'm', 'query': 'question', 'cache_hit': True}}, f"bad hit response: {hit}"
+        print("✓ Hit response carries the query and cache_hit flag")
+        
+        # LRU eviction: touching 'a' makes 'b' the least recently used
+        cache = SemanticCache(threshold=0.9, max_entries=2, ttl=None)
+        cache.add(a, {'answer': 'a'})
+        cache.add(b, {'answer': 'b'})
+        assert cache.lookup(a) == {'answer': 'a'}
+        cache.add(c, {'answer': 'c'})
+        assert cache.lookup(b) is None, "least recently used entry was not evicted"
+        assert cache.lookup(a) == {'answer': 'a'} and cache.lookup(c) == {'answer': 'c'}, "wrong entry evicted"
+        print("✓ Least recently used entry evicted")
+        
+        # Compaction: evicting a middle row keeps every other row paired with
+        # its own answer, in place in the preallocated slab
+        vecs = np.eye(5, dtype=np.float32)
+        cache = SemanticCache(threshold=0.9, max_entries=4, ttl=None)
+        for i in range(4):
+            cache.add(vecs[i], {'answer': i})
+        slab = cache._cache_mat
+        for i in (0, 2, 3):
+            cache.lookup(vecs[i])  # row 1 becomes least recently used
+        cache.add(vecs[4], {'answer': 4})
+        assert cache.lookup(vecs[1]) is None, "evicted row still returned"
+        assert all(cache.lookup(vecs[i]) == {'answer': i} for i in (0, 2, 3, 4)), "rows mismatched after compaction"
+        assert cache._cache_mat is slab, "slab was reallocated"
+        print("✓ Compaction keeps rows and answers aligned in the slab")
+        
+        # TTL expiry
+        cache = SemanticCache(threshold=0.9, max_entries=4, ttl=0.05)
+        cache.add(a, {'answer': 'a'})
+        time.sleep(0.1)
+        assert cache.lookup(a) is None, "expired entry returned"
+        assert cache.get_stats()['entries'] == 0, "expired entry not removed"
+        print("✓ Expired entries are dropped")
+        
+        print("\n✓ Semantic cache test passed!")
+        return True
+        
+    except AssertionError as e:
+        print(f"✗ Semantic cache test failed: {str(e)}")
+        return False
+
+
+def test_context_building():
+    """Test context assembly (no data needed)"""
+    print("\n" + "=" * 60)
+    print("TEST 0c: Context Building")
+    print("=" * 60)
+    
+    try:
+        results = [
+            {'content': "alpha " * 100},
+            {'content': "alpha " * 100},
+            {'content': "beta " * 100}
+        ]
+        context, kept = build_context(results, max_context_chars=200)
+        
+        assert kept == [results[0], results[2]], "duplicate chunk not dropped"
+        assert context.count("[Source ") == 2 and "[Source 2]: beta" in context, "sources misnumbered"
+        assert all(len(part.split(": ", 1)[1]) <= 100 for part in context.split("\n\n")), "budget not applied"
+        print("✓ Duplicates dropped, sources numbered and trimmed to the budget")
+        
+        print("\n✓ Context building test passed!")
+        return True
+        
+    except AssertionError as e:
+        print(f"✗ Context building test failed: {str(e)}")
+        return False
+
+
+def test_embedding_pooling():
+    """Test the fused pooling kernel against the NumPy path (no model needed)"""
+    print("\n" + "=" * 60)
+    print("TEST 0d: Embedding Pooling")
+    print("=" * 60)
+    
+    try:
+        rng = np.random.default_rng(0)
+        hidden = rng.standard_normal((3, 7, 384)).astype(np.float32)
+        mask = np.ones((3, 7), dtype=np.int64)
+        mask[1, 4:] = 0
+        
+        # Reference: sentence-transformers style mean pool, then L2 normalize
+        m = mask[..., None].astype(np.float32)
+        reference = (hidden * m).sum(axis=1) / m.sum(axis=1)
+        reference /= np.linalg.norm(reference, axis=1, keepdims=True)
+        
+        numpy_out = embedder._numpy_mean_pool_normalize(hidden, mask)
+        assert np.abs(numpy_out - reference).max() < 1e-5, "NumPy pooling differs from reference"
+        print("✓ NumPy pooling matches the reference")
+        
+        # Kernel logic (run as plain Python), and the compiled kernel if Numba is installed
+        kernel_out = np.empty_like(numpy_out)
+        embedder._masked_sum_normalize_kernel(hidden, mask, kernel_out)
+        assert np.abs(kernel_out - numpy_out).max() < 1e-5, "pooling kernel differs from NumPy path"
+        
+        pooled = embedder.mean_pool_normalize(hidden, mask)
+        assert np.abs(pooled - numpy_out).max() < 1e-5, "mean_pool_normalize differs from NumPy path"
+        compiled = "Numba" if embedder._masked_sum_normalize is not None else "Numba not installed"
+        print(f"✓ Pooling kernel matches the NumPy path ({compiled})")
+        
+        print("\n✓ Embedding pooling test passed!")
+        return True
+        
+    except AssertionError as e:
+        print(f"✗ Embedding pooling test failed: {str(e)}")
+        return False
 
 
 def test_ingestion():
@@ -58,10 +256,7 @@ def test_retrieval():
     
     try:
         # Load retriever
-        retriever = Retriever(
-            vectorstore_dir="vectorstore_test",
-            top_k=4
-        )
+        retriever = get_retriever()
         
         # Test queries
         test_queries = [
@@ -106,7 +301,8 @@ def test_chatbot():
         chatbot = RAGChatbot(
             vectorstore_dir="vectorstore_test",
             model="llama3.2",
-            top_k=4
+            top_k=4,
+            retriever=get_retriever()
         )
         
         # Test question
@@ -143,7 +339,8 @@ def test_failure_cases():
     try:
         chatbot = RAGChatbot(
             vectorstore_dir="vectorstore_test",
-            model="llama3.2"
+            model="llama3.2",
+            retriever=get_retriever()
         )
         
         # Test 1: Out-of-context question
@@ -195,6 +392,10 @@ def main():
     print("=" * 60)
     
     results = {
+        'Text Splitting': False,
+        'Semantic Cache': False,
+        'Context Building': False,
+        'Embedding Pooling': False,
         'Ingestion': False,
         'Retrieval': False,
         'Chatbot': False,
@@ -202,6 +403,10 @@ def main():
     }
     
     # Run tests
+    results['Text Splitting'] = test_text_splitting()
+    results['Semantic Cache'] = test_semantic_cache()
+    results['Context Building'] = test_context_building()
+    results['Embedding Pooling'] = test_embedding_pooling()
     results['Ingestion'] = test_ingestion()
     
     if results['Ingestion']: